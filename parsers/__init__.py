@@ -2,10 +2,27 @@
 Medical report parsers for different laboratory formats.
 """
 
+import re
+from itertools import islice
+
 from .parth_parser import parse_parth_format
 from .grant_parser import parse_grant_format
 from .arfa_parser import parse_arfa_format
 from .universal_parser import parse_universal_format
+from .common import empty_report
+
+
+# One pattern for all format keywords ("PARTH PATHOLOGY", "GRANT MEDICAL" and
+# "ARFA DIAGNOSTIC" are covered by their first word). Group order is priority order.
+_FORMAT_RE = re.compile(r"(PARTH)|(GRANT)|(ARFA)", re.IGNORECASE)
+_FORMAT_NAMES = ('parth', 'grant', 'arfa')
+
+# Format-specific parser for each detected format
+_FORMAT_PARSERS = {
+    'parth': parse_parth_format,
+    'grant': parse_grant_format,
+    'arfa': parse_arfa_format,
+}
 
 
 def detect_report_format(texts):
@@ -16,15 +33,21 @@ def detect_report_format(texts):
     if not texts:
         return 'unknown'
     
-    text_str = " ".join(texts[:50]).upper()  # Check first 50 items
-    
-    if "PARTH PATHOLOGY" in text_str or "PARTH" in text_str:
-        return 'parth'
-    elif "GRANT MEDICAL" in text_str or "GRANT" in text_str:
-        return 'grant'
-    elif "ARFA DIAGNOSTIC" in text_str or "ARFA" in text_str:
-        return 'arfa'
-    return 'unknown'
+    # Scan the first 50 items one by one (no keyword contains a space, so
+    # none can span two items); PARTH wins over GRANT, GRANT over ARFA, and
+    # the scan stops at the first PARTH
+    best = None
+    search = _FORMAT_RE.search
+    for text in islice(texts, 50):
+        if search(text) is None:
+            continue
+        for match in _FORMAT_RE.finditer(text):
+            group = match.lastindex - 1
+            if group == 0:
+                return _FORMAT_NAMES[0]
+            if best is None or group < best:
+                best = group
+    return _FORMAT_NAMES[best] if best is not None else 'unknown'
 
 
 def parse_medical_report(rec_texts):
@@ -33,15 +56,9 @@ def parse_medical_report(rec_texts):
     Supports multiple report formats: PARTH, Grant Medical, ARFA, and any other format via universal parser.
     """
     if not rec_texts:
-        return {
-            "patient_info": {},
-            "laboratory_info": {},
-            "haematology_report": [],
-            "blood_indices": [],
-            "morphology": {},
-            "footer_info": {},
-            "other_fields": {}
-        }
+        parsed_data = empty_report()
+        parsed_data["other_fields"] = {}
+        return parsed_data
     
     # Convert to list of strings for easier processing
     texts = [str(t).strip() for t in rec_texts if t and str(t).strip()]
@@ -51,36 +68,23 @@ def parse_medical_report(rec_texts):
     
     # Route to appropriate parser
     # For known formats, try specific parser first, then fallback to universal
-    if format_type == 'parth':
-        try:
-            result = parse_parth_format(texts)
-            # Validate that we got some data
-            if result.get('haematology_report') or result.get('blood_indices') or result.get('patient_info'):
-                return result
-        except Exception:
-            pass
-        # Fallback to universal parser
-        return parse_universal_format(texts)
-    elif format_type == 'grant':
+    format_parser = _FORMAT_PARSERS.get(format_type)
+    if format_parser is not None:
         try:
-            result = parse_grant_format(texts)
-            # Validate that we got some data
-            if result.get('haematology_report') or result.get('blood_indices') or result.get('patient_info'):
+            result = format_parser(texts)
+            if _has_report_data(result):
                 return result
         except Exception:
             pass
-        # Fallback to universal parser
-        return parse_universal_format(texts)
-    elif format_type == 'arfa':
-        try:
-            result = parse_arfa_format(texts)
-            # Validate that we got some data
-            if result.get('haematology_report') or result.get('blood_indices') or result.get('patient_info'):
-                return result
-        except Exception:
-            pass
-        # Fallback to universal parser
-        return parse_universal_format(texts)
-    else:
-        # Use universal parser for unknown formats or as fallback
-        return parse_universal_format(texts)
+    
+    # Use universal parser for unknown formats or as fallback (on the same
+    # normalized texts; it does no format detection of its own)
+    return parse_universal_format(texts)
+
+
+def _has_report_data(result):
+    """
+    Validate that a format-specific parser got some data: test results or
+    patient information.
+    """
+    return bool(result.get('haematology_report') or result.get('blood_indices') or result.get('patient_info'))
@@ -2,99 +2,87 @@
 Parser for ARFA DIAGNOSTIC CENTRE format reports.
 """
 
+import re
+
+from .common import empty_report, keyword_re, has_digit, find_label
+
+
+# Header labels, in the order they are checked: label -> (section, field).
+# The value is the text item that follows the label.
+_LABEL_FIELDS = {
+    "User:": ("patient_info", "user"),
+    "PHCR #:": ("laboratory_info", "phcr_number"),
+    "Booking No.:": ("patient_info", "booking_no"),
+    "Patient No.:": ("patient_info", "patient_no"),
+    "Patient Name:": ("patient_info", "patient_name"),
+    "Sample Collected:": ("patient_info", "sample_collected"),
+    "Age/Sex:": ("patient_info", "age_sex"),
+    "Test Booked:": ("patient_info", "test_booked"),
+    "Results Saved:": ("patient_info", "results_saved"),
+    "Mobile:": ("patient_info", "mobile"),
+    "Collection Point:": ("patient_info", "collection_point"),
+    "Consultant:": ("patient_info", "consultant"),
+}
+_LABEL_RE = keyword_re(_LABEL_FIELDS)
+
+# Common test names in ARFA format (matched as substrings: OCR items often
+# carry extra text around the name)
+_TEST_NAMES = (
+    "Hemoglobin (HB)", "Hematocrit (HCT)", "Red Blood Cell (RBC)",
+    "Mean Cell Volume (MCV)", "Mean Cell Hemoglobin (MCH)",
+    "Mean Cell Hb Conc (MCHC)", "White Blood Cell (WBC/TLC)",
+    "Neutrophils", "Lymphocytes", "Monocytes", "Eosinophil", "Basophils",
+    "Platelets Count"
+)
+_TEST_NAME_RE = keyword_re(_TEST_NAMES)
+
+# Substrings that mark a unit; the looser set (any "/") is used to tell
+# a result value from a unit
+_UNIT_TOKENS = ("g/dl", "%", "fl", "pg", "*10", "/ul", "/l")
+_UNIT_MARK_TOKENS = ("g/dl", "%", "fl", "pg", "*10", "/")
+_UNIT_RE = keyword_re(_UNIT_TOKENS)
+_UNIT_MARK_RE = keyword_re(_UNIT_MARK_TOKENS)
+
+# Test names that belong to the blood indices (matched on the lowercased name)
+_BLOOD_INDEX_RE = re.compile("mcv|mch|mchc|hct|hematocrit|mean cell")
+
+# Column headings skipped at the start of the HAEMATOLOGY section
+_COLUMN_HEADERS = frozenset({"Test", "Normal Range", "Unit", "Result", "CBC With ESR"})
+
+# Footer sentinels that end the test list (a "Dr." line ends it too, past item 50)
+_FOOTER_RE = re.compile(r"Electronically Generated|www\.")
+
+# Gender-specific reference range prefixes, skipped while looking for a value
+_GENDER_RANGE_RE = re.compile("Female:|Male:")
+
 
 def parse_arfa_format(texts):
     """
     Parse ARFA DIAGNOSTIC CENTRE format.
     """
-    parsed_data = {
-        "patient_info": {},
-        "laboratory_info": {},
-        "haematology_report": [],
-        "blood_indices": [],
-        "morphology": {},
-        "footer_info": {}
-    }
+    parsed_data = empty_report()
+    
+    # Local bindings for the hot loop
+    footer_info = parsed_data["footer_info"]
+    haem_append = parsed_data["haematology_report"].append
+    blood_append = parsed_data["blood_indices"].append
+    n = len(texts)
     
     i = 0
-    while i < len(texts):
+    while i < n:
         text = texts[i]
         
         # Parse Laboratory name
-        if "ARFA DIAGNOSTIC CENTRE" in text or "ARFA" in text:
+        if "ARFA" in text:  # also covers "ARFA DIAGNOSTIC CENTRE"
             parsed_data["laboratory_info"]["name"] = "ARFA DIAGNOSTIC CENTRE"
             i += 1
             continue
         
-        # Parse User
-        if "User:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["user"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse PHCR #
-        if "PHCR #:" in text and i + 1 < len(texts):
-            parsed_data["laboratory_info"]["phcr_number"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Booking No.
-        if "Booking No.:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["booking_no"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Patient No.
-        if "Patient No.:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["patient_no"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Patient Name
-        if "Patient Name:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["patient_name"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Sample Collected
-        if "Sample Collected:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["sample_collected"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Age/Sex
-        if "Age/Sex:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["age_sex"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Test Booked
-        if "Test Booked:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["test_booked"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Results Saved
-        if "Results Saved:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["results_saved"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Mobile
-        if "Mobile:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["mobile"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Collection Point
-        if "Collection Point:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["collection_point"] = texts[i + 1].strip()
-            i += 2
-            continue
-        
-        # Parse Consultant
-        if "Consultant:" in text and i + 1 < len(texts):
-            parsed_data["patient_info"]["consultant"] = texts[i + 1].strip()
+        # Parse header labels (User:, PHCR #:, Booking No.:, ...)
+        label = find_label(text, _LABEL_FIELDS, _LABEL_RE)
+        if label and i + 1 < n:
+            section, field = _LABEL_FIELDS[label]
+            parsed_data[section][field] = texts[i + 1].strip()
             i += 2
             continue
         
@@ -102,16 +90,16 @@ def parse_arfa_format(texts):
         if "HAEMATOLOGY" in text:
             i += 1
             # Skip column headers
-            while i < len(texts) and texts[i] in ["Test", "Normal Range", "Unit", "Result", "CBC With ESR"]:
+            while i < n and texts[i] in _COLUMN_HEADERS:
                 i += 1
             
             # Parse test results - ARFA format has mixed order
             # Pattern: Test Name, [Normal Range (may have gender)], Unit, Result
-            while i < len(texts):
+            while i < n:
                 test_text = texts[i]
                 
                 # Stop at footer sections
-                if "Electronically Generated" in test_text or ("Dr." in test_text and i > 50) or "www." in test_text:
+                if _FOOTER_RE.search(test_text) or ("Dr." in test_text and i > 50):
                     break
                 
                 # Skip empty
@@ -119,17 +107,8 @@ def parse_arfa_format(texts):
                     i += 1
                     continue
                 
-                # Common test names in ARFA format
-                test_names = [
-                    "Hemoglobin (HB)", "Hematocrit (HCT)", "Red Blood Cell (RBC)",
-                    "Mean Cell Volume (MCV)", "Mean Cell Hemoglobin (MCH)",
-                    "Mean Cell Hb Conc (MCHC)", "White Blood Cell (WBC/TLC)",
-                    "Neutrophils", "Lymphocytes", "Monocytes", "Eosinophil", "Basophils",
-                    "Platelets Count"
-                ]
-                
                 # Check if current text is a test name
-                is_test_name = any(tn in test_text for tn in test_names)
+                is_test_name = _TEST_NAME_RE.search(test_text) is not None
                 
                 if is_test_name:
                     test_name = test_text
@@ -140,44 +119,45 @@ def parse_arfa_format(texts):
                     # Look ahead to find value, unit, and range
                     # ARFA format: Test Name -> [Range/Gender Range] -> Unit -> Result
                     j = i + 1
+                    end = min(i + 6, n)
                     found_range = False
                     
-                    while j < min(i + 6, len(texts)):
+                    while j < end:
                         next_text = texts[j]
                         
                         # Skip gender-specific ranges (Female:, Male:)
-                        if "Female:" in next_text or "Male:" in next_text:
+                        if _GENDER_RANGE_RE.search(next_text):
                             j += 1
                             continue
                         
                         # Check if it's a range (contains "-" and digits)
-                        if "-" in next_text and any(char.isdigit() for char in next_text) and not found_range:
+                        if "-" in next_text and has_digit(next_text) and not found_range:
                             ref_range = next_text.strip()
                             found_range = True
                             j += 1
                             continue
                         
                         # Check if it's a unit
-                        if any(x in next_text for x in ["g/dl", "%", "fl", "pg", "*10", "/ul", "/l"]) and not unit:
+                        if not unit and _UNIT_RE.search(next_text):
                             unit = next_text.strip()
                             j += 1
                             continue
                         
                         # Check if it's a result value (contains digits, may have ↓ or ↑)
-                        if any(char.isdigit() for char in next_text) and not value:
+                        if not value and has_digit(next_text):
                             # Make sure it's not a range or unit
-                            if "-" not in next_text and not any(x in next_text for x in ["g/dl", "%", "fl", "pg", "*10", "/"]):
+                            if "-" not in next_text and not _UNIT_MARK_RE.search(next_text):
                                 value = next_text.strip()
                                 j += 1
                                 # After finding value, check if next items are unit/range if not found
-                                if j < len(texts) and not unit:
+                                if j < n and not unit:
                                     potential_unit = texts[j]
-                                    if any(x in potential_unit for x in ["g/dl", "%", "fl", "pg", "*10", "/"]):
+                                    if _UNIT_MARK_RE.search(potential_unit):
                                         unit = potential_unit.strip()
                                         j += 1
-                                if j < len(texts) and not ref_range:
+                                if j < n and not ref_range:
                                     potential_range = texts[j]
-                                    if "-" in potential_range and any(char.isdigit() for char in potential_range):
+                                    if "-" in potential_range and has_digit(potential_range):
                                         ref_range = potential_range.strip()
                                         j += 1
                                 break
@@ -185,16 +165,15 @@ def parse_arfa_format(texts):
                         j += 1
                     
                     # Determine category
-                    test_lower = test_name.lower()
-                    if any(x in test_lower for x in ["mcv", "mch", "mchc", "hct", "hematocrit", "mean cell"]):
-                        parsed_data["blood_indices"].append({
+                    if _BLOOD_INDEX_RE.search(test_name.lower()):
+                        blood_append({
                             "test_name": test_name,
                             "observed_value": value,
                             "unit": unit,
                             "reference_range": ref_range
                         })
                     else:
-                        parsed_data["haematology_report"].append({
+                        haem_append({
                             "test_name": test_name,
                             "observed_value": value,
                             "unit": unit,
@@ -206,10 +185,10 @@ def parse_arfa_format(texts):
                     i += 1
         
         # Parse Footer (doctors, etc.)
-        elif "Dr." in text and i + 1 < len(texts):
+        elif "Dr." in text and i + 1 < n:
             # Collect doctor information
-            if "doctor_name" not in parsed_data["footer_info"]:
-                parsed_data["footer_info"]["doctor_name"] = text
+            if "doctor_name" not in footer_info:
+                footer_info["doctor_name"] = text
             i += 1
         else:
             i += 1
@@ -0,0 +1,59 @@
+"""
+Helpers shared by the report format parsers.
+"""
+
+import re
+
+
+_DECIMAL_RE = re.compile(r"\d")
+
+
+def empty_report():
+    """
+    Return the sections every parser fills, all empty.
+    """
+    return {
+        "patient_info": {},
+        "laboratory_info": {},
+        "haematology_report": [],
+        "blood_indices": [],
+        "morphology": {},
+        "footer_info": {}
+    }
+
+
+def keyword_re(keywords, flags=0):
+    """
+    Compile a pattern matching any of the literal keywords.
+    """
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords), flags)
+
+
+def has_digit(text):
+    """
+    Same as any(char.isdigit() for char in text). The regex covers decimal
+    digits; only non-ASCII text needs the per-character check for other
+    digit characters such as superscripts.
+    """
+    if _DECIMAL_RE.search(text):
+        return True
+    if text.isascii():
+        return False
+    return any(char.isdigit() for char in text)
+
+
+def find_label(text, labels, label_re):
+    """
+    Return the first label (in labels order) contained in text, or None.
+    label_re is keyword_re(labels). Labels are usually a whole OCR item, so
+    a dict lookup is tried first and a single regex scan rules out items
+    without any label.
+    """
+    if text in labels:
+        return text
+    if label_re.search(text) is None:
+        return None
+    for label in labels:
+        if label in text:
+            return label
+    return None
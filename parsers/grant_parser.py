@@ -2,92 +2,81 @@
 Parser for Grant Medical Foundation format reports.
 """
 
+import re
+
+from .common import empty_report, keyword_re, find_label
+
+
+# Patient header labels, in the order they are checked:
+# label -> (field, strip colons from the value)
+_LABEL_FIELDS = {
+    "Received Date": ("received_date", False),
+    "Report Date": ("report_date", False),
+    "Lab No/Result No": ("lab_no", False),
+    "Referred By Dr.": ("referring_doctor", True),
+    "Specimen": ("specimen", True),
+    "Ward / Bed": ("ward_bed", True),
+}
+_LABEL_RE = keyword_re(_LABEL_FIELDS)
+
+# Test names that belong to the blood indices (matched on the lowercased name)
+_BLOOD_INDEX_RE = re.compile("mcv|mch|mchc|rdw|hct|hematocrit")
+
+# Column headings skipped at the start of the HAEMATOLOGY section
+_COLUMN_HEADERS = frozenset({"Investigation", "Result", "Units", "Biological Reference Interval", "Haemogram Report"})
+
+# Footer labels that end the test list
+_FOOTER_RE = re.compile("Printed By|Printed On")
+
 
 def parse_grant_format(texts):
     """
     Parse Grant Medical Foundation format.
     """
-    parsed_data = {
-        "patient_info": {},
-        "laboratory_info": {},
-        "haematology_report": [],
-        "blood_indices": [],
-        "morphology": {},
-        "footer_info": {}
-    }
+    parsed_data = empty_report()
+    
+    # Local bindings for the hot loop
+    patient_info = parsed_data["patient_info"]
+    footer_info = parsed_data["footer_info"]
+    haem_append = parsed_data["haematology_report"].append
+    blood_append = parsed_data["blood_indices"].append
+    n = len(texts)
+    padded = texts + ["", ""]  # row items past the end read as ""
     
     i = 0
-    while i < len(texts):
+    while i < n:
         text = texts[i]
         
         # Parse Laboratory name
-        if "Grant Medical Foundation" in text or "Grant Medical" in text:
+        if "Grant Medical" in text:  # also covers "Grant Medical Foundation"
             parsed_data["laboratory_info"]["name"] = "Grant Medical Foundation"
             i += 1
             continue
         
-        # Parse Received Date
-        if "Received Date" in text and i + 1 < len(texts):
-            date_value = texts[i + 1].strip()
-            if date_value:
-                parsed_data["patient_info"]["received_date"] = date_value
-            i += 2
-            continue
-        
-        # Parse Report Date
-        if "Report Date" in text and i + 1 < len(texts):
-            date_value = texts[i + 1].strip()
-            if date_value:
-                parsed_data["patient_info"]["report_date"] = date_value
-            i += 2
-            continue
-        
-        # Parse Lab No/Result No
-        if "Lab No/Result No" in text and i + 1 < len(texts):
-            lab_no = texts[i + 1].strip()
-            if lab_no:
-                parsed_data["patient_info"]["lab_no"] = lab_no
-            i += 2
-            continue
-        
-        # Parse Referred By Dr.
-        if "Referred By Dr." in text and i + 1 < len(texts):
-            doctor = texts[i + 1].replace(":", "").strip()
-            if doctor:
-                parsed_data["patient_info"]["referring_doctor"] = doctor
-            i += 2
-            continue
-        
-        # Parse Specimen
-        if "Specimen" in text and i + 1 < len(texts):
-            specimen = texts[i + 1].replace(":", "").strip()
-            if specimen:
-                parsed_data["patient_info"]["specimen"] = specimen
-            i += 2
-            continue
-        
-        # Parse Ward / Bed
-        if "Ward / Bed" in text and i + 1 < len(texts):
-            ward = texts[i + 1].replace(":", "").strip()
-            if ward:
-                parsed_data["patient_info"]["ward_bed"] = ward
+        # Parse patient header labels (Received Date, Report Date, Specimen, ...)
+        label = find_label(text, _LABEL_FIELDS, _LABEL_RE)
+        if label and i + 1 < n:
+            field, strip_colons = _LABEL_FIELDS[label]
+            value = texts[i + 1].replace(":", "").strip() if strip_colons else texts[i + 1].strip()
+            if value:
+                patient_info[field] = value
             i += 2
             continue
         
         # Parse HAEMATOLOGY section
-        if "DEPARTMENT OF LABORATORY MEDICINE-HAEMATOLOGY" in text or "HAEMATOLOGY" in text:
+        if "HAEMATOLOGY" in text:  # also covers "DEPARTMENT OF LABORATORY MEDICINE-HAEMATOLOGY"
             i += 1
             # Skip headers
-            while i < len(texts) and texts[i] in ["Investigation", "Result", "Units", "Biological Reference Interval", "Haemogram Report"]:
+            while i < n and texts[i] in _COLUMN_HEADERS:
                 i += 1
             
             # Parse test results
             in_differential_count = False
-            while i < len(texts):
+            while i < n:
                 test_text = texts[i]
                 
                 # Stop at footer
-                if "Printed By" in test_text or "Printed On" in test_text:
+                if _FOOTER_RE.search(test_text):
                     break
                 
                 # Check for Differential Count section
@@ -102,27 +91,22 @@ def parse_grant_format(texts):
                     continue
                 
                 # Skip empty or colon-only
-                if not test_text or test_text == ":" or test_text.startswith(":"):
+                if not test_text or test_text.startswith(":"):
                     i += 1
                     continue
                 
                 # Check if this is a test name followed by ": value"
-                if i + 1 < len(texts) and texts[i + 1].startswith(":"):
+                if i + 1 < n and texts[i + 1].startswith(":"):
                     test_name = test_text
                     value_text = texts[i + 1].replace(":", "").strip()
                     
                     # Get unit and reference range
-                    unit = ""
-                    ref_range = ""
-                    if i + 2 < len(texts):
-                        unit = texts[i + 2].strip()
-                    if i + 3 < len(texts):
-                        ref_range = texts[i + 3].strip()
+                    unit = padded[i + 2].strip()
+                    ref_range = padded[i + 3].strip()
                     
                     # Determine if it's haematology or blood indices
-                    test_lower = test_name.lower()
-                    if any(x in test_lower for x in ["mcv", "mch", "mchc", "rdw", "hct", "hematocrit"]):
-                        parsed_data["blood_indices"].append({
+                    if _BLOOD_INDEX_RE.search(test_name.lower()):
+                        blood_append({
                             "test_name": test_name,
                             "observed_value": value_text,
                             "unit": unit,
@@ -137,7 +121,7 @@ def parse_grant_format(texts):
                         }
                         if in_differential_count:
                             test_entry["category"] = "Differential Count"
-                        parsed_data["haematology_report"].append(test_entry)
+                        haem_append(test_entry)
                     
                     i += 4
                 else:
@@ -145,11 +129,11 @@ def parse_grant_format(texts):
         
         # Parse Footer
         elif "Printed By" in text:
-            if i + 1 < len(texts):
-                parsed_data["footer_info"]["printed_by"] = texts[i + 1].replace(":", "").strip()
-            if i + 2 < len(texts) and "Printed On" in texts[i + 2]:
-                if i + 3 < len(texts):
-                    parsed_data["footer_info"]["printed_on"] = texts[i + 3].strip()
+            if i + 1 < n:
+                footer_info["printed_by"] = texts[i + 1].replace(":", "").strip()
+            if i + 2 < n and "Printed On" in texts[i + 2]:
+                if i + 3 < n:
+                    footer_info["printed_on"] = texts[i + 3].strip()
             i += 4
         else:
             i += 1
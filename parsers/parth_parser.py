@@ -2,240 +2,346 @@
 Parser for PARTH PATHOLOGY LABORATORY format reports.
 """
 
+import re
 
-def parse_parth_format(texts):
+from .common import empty_report, keyword_re, has_digit
+
+
+def _parse_patient_id(texts, i, parsed_data):
     """
-    Parse PARTH PATHOLOGY LABORATORY format (original format).
+    Parse "Patient ID" followed by ": <id>". Returns the next index, or None if
+    there is no value after the label.
+    """
+    if i + 1 >= len(texts):
+        return None
+    next_text = texts[i + 1]
+    if next_text.startswith(":"):
+        patient_id = next_text.replace(":", "").strip()
+        parsed_data["patient_info"]["patient_id"] = patient_id
+    return i + 2
+
+
+def _date_parser(field):
+    """
+    Build a parser for a date label whose value is one of the next two items.
+    """
+    def parse_date(texts, i, parsed_data):
+        for j, next_text in enumerate(texts[i + 1:i + 3], i + 1):
+            if next_text.startswith(":") or has_digit(next_text):
+                date_value = next_text.replace(":", "").strip()
+                if date_value:
+                    parsed_data["patient_info"][field] = date_value
+                    return j + 1
+        return i + 1
+    return parse_date
+
+
+def _parse_lab_name(texts, i, parsed_data):
+    parsed_data["laboratory_info"]["name"] = "PARTH PATHOLOGY LABORATORY"
+    return i + 1
+
+
+# Header labels, in the order they are checked: label -> parser.
+# A parser returns the index to continue from, or None to fall through.
+_LABEL_HANDLERS = {
+    "Patient ID": _parse_patient_id,
+    "Collection Date": _date_parser("collection_date"),
+    "Reporting Date": _date_parser("reporting_date"),
+    "PATHOLOGY LABORATORY": _parse_lab_name,
+}
+_LABEL_RE = keyword_re(_LABEL_HANDLERS)
+
+# Headings that end the HAEMATOLOGY REPORT / DIFFERENTIAL COUNT / BLOOD INDICES test lists
+_HAEMATOLOGY_END_RE = re.compile(r"DIFFERENTIAL COUNT|PLATELET COUNT|BLOOD INDICES|\*\* End of Report")
+_DIFFERENTIAL_END_RE = re.compile(r"PLATELET COUNT|BLOOD INDICES|\*\* End of Report")
+_BLOOD_INDICES_END_RE = re.compile(r"RBC Morphology|Platelets on Smear|\*\* End of Report")
+
+# Table column headings repeated in the test lists
+_COLUMN_HEADERS = frozenset({"Test Name", "Observed Value", "Unit", "Reference Range"})
+
+# Blood index names whose value may follow without a leading colon
+_BLOOD_INDEX_NAMES = frozenset({"M.C.H.C.", "H.C.T.", "M.C.V.", "M.C.H.", "R.D.W.", "M.P.V.", "Plateletcrit (PCT)"})
+
+def _find_labels(text):
+    """
+    Yield the header labels contained in text, in _LABEL_HANDLERS order.
+    Labels are usually a whole OCR item, so a dict lookup is tried first and
+    a single regex scan rules out items without any label.
+    """
+    if text in _LABEL_HANDLERS:
+        yield text
+        return
+    if _LABEL_RE.search(text) is None:
+        return
+    for label in _LABEL_HANDLERS:
+        if label in text:
+            yield label
+
+
+def _parse_header_label(texts, i, parsed_data):
+    """
+    Dispatch texts[i] to its header label parser. Returns the next index, or
+    None if the item is not a header label.
+    """
+    for label in _find_labels(texts[i]):
+        next_i = _LABEL_HANDLERS[label](texts, i, parsed_data)
+        if next_i is not None:
+            return next_i
+    return None
+
+
+def _parse_referring_doctor(texts, i, parsed_data):
+    text = texts[i]
+    if "Dr." not in text:
+        return None
+    parsed_data["patient_info"]["referring_doctor"] = text
+    return i + 1
+
+
+def _parse_haematology_report(texts, i, parsed_data):
+    """
+    Parse the HAEMATOLOGY REPORT test list: "name", ": value", unit, range.
     """
-    parsed_data = {
-        "patient_info": {},
-        "laboratory_info": {},
-        "haematology_report": [],
-        "blood_indices": [],
-        "morphology": {},
-        "footer_info": {}
-    }
+    haem_append = parsed_data["haematology_report"].append
+    n = len(texts)
+    i += 1
+    while i < n and texts[i] in _COLUMN_HEADERS:
+        i += 1
     
-    i = 0
-    while i < len(texts):
-        text = texts[i]
+    while i < n:
+        test_text = texts[i]
         
-        # Parse Patient ID
-        if "Patient ID" in text and i + 1 < len(texts):
-            next_text = texts[i + 1]
-            if next_text.startswith(":"):
-                patient_id = next_text.replace(":", "").strip()
-                parsed_data["patient_info"]["patient_id"] = patient_id
-            i += 2
-            continue
+        if _HAEMATOLOGY_END_RE.search(test_text):
+            break
         
-        # Parse Collection Date
-        if "Collection Date" in text:
-            for j in range(i + 1, min(i + 3, len(texts))):
-                next_text = texts[j]
-                if next_text.startswith(":") or any(char.isdigit() for char in next_text):
-                    date_value = next_text.replace(":", "").strip()
-                    if date_value:
-                        parsed_data["patient_info"]["collection_date"] = date_value
-                        i = j + 1
-                        break
-            else:
-                i += 1
-            continue
-        
-        # Parse Reporting Date
-        if "Reporting Date" in text:
-            for j in range(i + 1, min(i + 3, len(texts))):
-                next_text = texts[j]
-                if next_text.startswith(":") or any(char.isdigit() for char in next_text):
-                    date_value = next_text.replace(":", "").strip()
-                    if date_value:
-                        parsed_data["patient_info"]["reporting_date"] = date_value
-                        i = j + 1
-                        break
-            else:
-                i += 1
+        if test_text.startswith(":") or not test_text or test_text in _COLUMN_HEADERS:
+            i += 1
             continue
         
-        # Parse Laboratory name
-        if "PATHOLOGY LABORATORY" in text:
-            parsed_data["laboratory_info"]["name"] = "PARTH PATHOLOGY LABORATORY"
+        if i + 1 < n and texts[i + 1].startswith(":"):
+            test_name = test_text
+            value_text = texts[i + 1].replace(":", "").strip()
+            unit = texts[i + 2] if i + 2 < n else ""
+            ref_range = texts[i + 3] if i + 3 < n else ""
+            
+            if i + 2 < n and not ("-" in texts[i + 2] or has_digit(texts[i + 2])):
+                unit = ""
+                ref_range = texts[i + 2] if i + 2 < n else ""
+            
+            haem_append({
+                "test_name": test_name,
+                "observed_value": value_text,
+                "unit": unit,
+                "reference_range": ref_range
+            })
+            i += 4
+        else:
             i += 1
-            continue
+    return i
+
+
+def _parse_differential_count(texts, i, parsed_data):
+    """
+    Parse the DIFFERENTIAL COUNT test list into the haematology report.
+    """
+    haem_append = parsed_data["haematology_report"].append
+    n = len(texts)
+    i += 1
+    while i < n:
+        test_text = texts[i]
+        
+        if _DIFFERENTIAL_END_RE.search(test_text):
+            break
         
-        # Parse Reference Doctor
-        if "Dr." in text and "Hospital" in text:
-            parsed_data["patient_info"]["referring_doctor"] = text
+        if test_text.startswith(":") or not test_text:
             i += 1
             continue
         
-        # Parse HAEMATOLOGY REPORT section
-        if "HAEMATOLOGY REPORT" in text:
-            i += 1
-            while i < len(texts) and texts[i] in ["Test Name", "Observed Value", "Unit", "Reference Range"]:
-                i += 1
+        if "?olymorphs" in test_text or "olymorphs" in test_text.lower():
+            test_text = "Polymorphs"
+        
+        if i + 1 < n and texts[i + 1].startswith(":"):
+            test_name = test_text
+            value_text = texts[i + 1].replace(":", "").strip()
+            unit = texts[i + 2] if i + 2 < n else ""
+            ref_range = texts[i + 3] if i + 3 < n else ""
             
-            while i < len(texts):
-                test_text = texts[i]
-                
-                if any(header in test_text for header in ["DIFFERENTIAL COUNT", "PLATELET COUNT", "BLOOD INDICES", "** End of Report"]):
-                    break
-                
-                if test_text.startswith(":") or not test_text or test_text in ["Test Name", "Observed Value", "Unit", "Reference Range"]:
-                    i += 1
-                    continue
-                
-                if i + 1 < len(texts) and texts[i + 1].startswith(":"):
-                    test_name = test_text
-                    value_text = texts[i + 1].replace(":", "").strip()
-                    unit = texts[i + 2] if i + 2 < len(texts) else ""
-                    ref_range = texts[i + 3] if i + 3 < len(texts) else ""
-                    
-                    if i + 2 < len(texts) and not any(char.isdigit() or char in "-" for char in texts[i + 2]):
-                        unit = ""
-                        ref_range = texts[i + 2] if i + 2 < len(texts) else ""
-                    
-                    parsed_data["haematology_report"].append({
-                        "test_name": test_name,
-                        "observed_value": value_text,
-                        "unit": unit,
-                        "reference_range": ref_range
-                    })
-                    i += 4
-                else:
-                    i += 1
+            haem_append({
+                "test_name": test_name,
+                "observed_value": value_text,
+                "unit": unit,
+                "reference_range": ref_range,
+                "category": "Differential Count"
+            })
+            i += 4
+        else:
+            i += 1
+    return i
+
+
+def _parse_platelet_count(texts, i, parsed_data):
+    n = len(texts)
+    i += 1
+    if i < n and texts[i].startswith(":"):
+        value_text = texts[i].replace(":", "").strip()
+        unit = texts[i + 1] if i + 1 < n else ""
+        ref_range = texts[i + 2] if i + 2 < n else ""
+        
+        parsed_data["haematology_report"].append({
+            "test_name": "PLATELET COUNT",
+            "observed_value": value_text,
+            "unit": unit,
+            "reference_range": ref_range
+        })
+        return i + 3
+    return i + 1
+
+
+def _parse_blood_indices(texts, i, parsed_data):
+    """
+    Parse the BLOOD INDICES test list. Known index names may be followed by
+    the value without a leading colon.
+    """
+    blood_append = parsed_data["blood_indices"].append
+    n = len(texts)
+    i += 1
+    while i < n:
+        test_text = texts[i]
+        
+        if _BLOOD_INDICES_END_RE.search(test_text):
+            break
         
-        # Parse DIFFERENTIAL COUNT
-        elif "DIFFERENTIAL COUNT" in text:
+        if test_text.startswith(":") or not test_text:
             i += 1
-            while i < len(texts):
-                test_text = texts[i]
-                
-                if any(header in test_text for header in ["PLATELET COUNT", "BLOOD INDICES", "** End of Report"]):
-                    break
-                
-                if test_text.startswith(":") or not test_text:
-                    i += 1
-                    continue
-                
-                if "?olymorphs" in test_text or "olymorphs" in test_text.lower():
-                    test_text = "Polymorphs"
-                
-                if i + 1 < len(texts) and texts[i + 1].startswith(":"):
-                    test_name = test_text
-                    value_text = texts[i + 1].replace(":", "").strip()
-                    unit = texts[i + 2] if i + 2 < len(texts) else ""
-                    ref_range = texts[i + 3] if i + 3 < len(texts) else ""
-                    
-                    parsed_data["haematology_report"].append({
-                        "test_name": test_name,
-                        "observed_value": value_text,
-                        "unit": unit,
-                        "reference_range": ref_range,
-                        "category": "Differential Count"
-                    })
+            continue
+        
+        if test_text in _BLOOD_INDEX_NAMES:
+            test_name = test_text
+            if i + 1 < n:
+                next_text = texts[i + 1]
+                if next_text.startswith(":"):
+                    value_text = next_text.replace(":", "").strip()
+                    unit = texts[i + 2] if i + 2 < n else ""
+                    ref_range = texts[i + 3] if i + 3 < n else ""
                     i += 4
                 else:
-                    i += 1
-        
-        # Parse PLATELET COUNT
-        elif "PLATELET COUNT" in text:
-            i += 1
-            if i < len(texts) and texts[i].startswith(":"):
-                value_text = texts[i].replace(":", "").strip()
-                unit = texts[i + 1] if i + 1 < len(texts) else ""
-                ref_range = texts[i + 2] if i + 2 < len(texts) else ""
+                    value_text = next_text.strip()
+                    unit = texts[i + 2] if i + 2 < n else ""
+                    ref_range = texts[i + 3] if i + 3 < n else ""
+                    i += 4
                 
-                parsed_data["haematology_report"].append({
-                    "test_name": "PLATELET COUNT",
+                blood_append({
+                    "test_name": test_name,
                     "observed_value": value_text,
                     "unit": unit,
                     "reference_range": ref_range
                 })
-                i += 3
-            else:
-                i += 1
-        
-        # Parse BLOOD INDICES
-        elif "BLOOD INDICES" in text:
-            i += 1
-            while i < len(texts):
-                test_text = texts[i]
-                
-                if any(header in test_text for header in ["RBC Morphology", "Platelets on Smear", "** End of Report"]):
-                    break
-                
-                if test_text.startswith(":") or not test_text:
-                    i += 1
-                    continue
-                
-                if test_text in ["M.C.H.C.", "H.C.T.", "M.C.V.", "M.C.H.", "R.D.W.", "M.P.V.", "Plateletcrit (PCT)"]:
-                    test_name = test_text
-                    if i + 1 < len(texts):
-                        next_text = texts[i + 1]
-                        if next_text.startswith(":"):
-                            value_text = next_text.replace(":", "").strip()
-                            unit = texts[i + 2] if i + 2 < len(texts) else ""
-                            ref_range = texts[i + 3] if i + 3 < len(texts) else ""
-                            i += 4
-                        else:
-                            value_text = next_text.strip()
-                            unit = texts[i + 2] if i + 2 < len(texts) else ""
-                            ref_range = texts[i + 3] if i + 3 < len(texts) else ""
-                            i += 4
-                        
-                        parsed_data["blood_indices"].append({
-                            "test_name": test_name,
-                            "observed_value": value_text,
-                            "unit": unit,
-                            "reference_range": ref_range
-                        })
-                    else:
-                        i += 1
-                elif i + 1 < len(texts) and texts[i + 1].startswith(":"):
-                    test_name = test_text
-                    value_text = texts[i + 1].replace(":", "").strip()
-                    unit = texts[i + 2] if i + 2 < len(texts) else ""
-                    ref_range = texts[i + 3] if i + 3 < len(texts) else ""
-                    
-                    parsed_data["blood_indices"].append({
-                        "test_name": test_name,
-                        "observed_value": value_text,
-                        "unit": unit,
-                        "reference_range": ref_range
-                    })
-                    i += 4
-                else:
-                    i += 1
-        
-        # Parse Morphology
-        elif "RBC Morphology" in text:
-            if i + 1 < len(texts) and texts[i + 1].startswith(":"):
-                morphology1 = texts[i + 1].replace(":", "").strip()
-                morphology2 = texts[i + 2] if i + 2 < len(texts) else ""
-                parsed_data["morphology"]["rbc_morphology"] = f"{morphology1} {morphology2}".strip()
-                i += 3
             else:
                 i += 1
-        elif "Platelets on Smear" in text:
-            if i + 1 < len(texts):
-                parsed_data["morphology"]["platelets_on_smear"] = texts[i + 1]
-                i += 2
-            else:
-                i += 1
-        
-        # Parse Footer info
-        elif "Dr." in text and "Rajput" in text:
-            parsed_data["footer_info"]["doctor_name"] = text
-            if i + 1 < len(texts):
-                parsed_data["footer_info"]["qualification"] = texts[i + 1]
-            if i + 2 < len(texts) and "Registration" in texts[i + 2]:
-                parsed_data["footer_info"]["registration"] = texts[i + 2]
-            i += 3
-        elif "Lab Technician" in text:
-            parsed_data["footer_info"]["lab_technician"] = text
-            i += 1
+        elif i + 1 < n and texts[i + 1].startswith(":"):
+            test_name = test_text
+            value_text = texts[i + 1].replace(":", "").strip()
+            unit = texts[i + 2] if i + 2 < n else ""
+            ref_range = texts[i + 3] if i + 3 < n else ""
+            
+            blood_append({
+                "test_name": test_name,
+                "observed_value": value_text,
+                "unit": unit,
+                "reference_range": ref_range
+            })
+            i += 4
         else:
             i += 1
+    return i
+
+
+def _parse_rbc_morphology(texts, i, parsed_data):
+    n = len(texts)
+    if i + 1 < n and texts[i + 1].startswith(":"):
+        morphology1 = texts[i + 1].replace(":", "").strip()
+        morphology2 = texts[i + 2] if i + 2 < n else ""
+        parsed_data["morphology"]["rbc_morphology"] = f"{morphology1} {morphology2}".strip()
+        return i + 3
+    return i + 1
+
+
+def _parse_platelets_on_smear(texts, i, parsed_data):
+    if i + 1 < len(texts):
+        parsed_data["morphology"]["platelets_on_smear"] = texts[i + 1]
+        return i + 2
+    return i + 1
+
+
+def _parse_signing_doctor(texts, i, parsed_data):
+    text = texts[i]
+    if "Dr." not in text:
+        return None
+    n = len(texts)
+    footer_info = parsed_data["footer_info"]
+    footer_info["doctor_name"] = text
+    if i + 1 < n:
+        footer_info["qualification"] = texts[i + 1]
+    if i + 2 < n and "Registration" in texts[i + 2]:
+        footer_info["registration"] = texts[i + 2]
+    return i + 3
+
+
+def _parse_lab_technician(texts, i, parsed_data):
+    parsed_data["footer_info"]["lab_technician"] = texts[i]
+    return i + 1
+
+
+# Section / footer keywords, in the order they are checked: keyword -> parser.
+# A parser returns the index to continue from, or None to fall through (the
+# doctor entries also need "Dr." in the item).
+_SECTION_HANDLERS = {
+    "Hospital": _parse_referring_doctor,
+    "HAEMATOLOGY REPORT": _parse_haematology_report,
+    "DIFFERENTIAL COUNT": _parse_differential_count,
+    "PLATELET COUNT": _parse_platelet_count,
+    "BLOOD INDICES": _parse_blood_indices,
+    "RBC Morphology": _parse_rbc_morphology,
+    "Platelets on Smear": _parse_platelets_on_smear,
+    "Rajput": _parse_signing_doctor,
+    "Lab Technician": _parse_lab_technician,
+}
+_SECTION_RE = keyword_re(_SECTION_HANDLERS)
+
+
+def _parse_section(texts, i, parsed_data):
+    """
+    Dispatch texts[i] to its section / footer parser. Returns the next index,
+    or None if the item starts no section. A single regex scan rules out
+    items without any keyword.
+    """
+    text = texts[i]
+    if _SECTION_RE.search(text) is None:
+        return None
+    for keyword, handler in _SECTION_HANDLERS.items():
+        if keyword in text:
+            next_i = handler(texts, i, parsed_data)
+            if next_i is not None:
+                return next_i
+    return None
+
+
+def parse_parth_format(texts):
+    """
+    Parse PARTH PATHOLOGY LABORATORY format (original format).
+    Each item is dispatched to the parser of the header label or section
+    keyword it contains; the parser returns the index to continue from.
+    """
+    parsed_data = empty_report()
+    
+    n = len(texts)
+    i = 0
+    while i < n:
+        # Parse header labels (Patient ID, Collection Date, Reporting Date, lab name)
+        next_i = _parse_header_label(texts, i, parsed_data)
+        if next_i is None:
+            # Parse sections (test lists, morphology) and footer info
+            next_i = _parse_section(texts, i, parsed_data)
+        i = next_i if next_i is not None else i + 1
     
     return parsed_data
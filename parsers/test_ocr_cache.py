@@ -0,0 +1,187 @@
+"""
+Tests for the OCR result cache of ocr_processor (raw_data/<hash>.cache.json).
+A stub engine stands in for PaddleOCR, so paddleocr is not needed.
+"""
+import os
+import json
+
+import cv2
+import numpy as np
+
+import ocr_processor
+
+
+# Texts returned by the stub engine for every image
+STUB_TEXTS = ["Patient ID", ": 202504255", "HAEMATOLOGY REPORT",
+              "HEMOGLOBIN", ": 12.0", "g/dl", "13.5-17.5"]
+
+
+class StubEngine:
+    """
+    Stand-in for a PaddleOCR engine: counts the images it is given and
+    returns one result page (shaped like PaddleOCR's) per image.
+    """
+    
+    def __init__(self):
+        self.images = 0
+    
+    def ocr(self, img):
+        images = img if isinstance(img, list) else [img]
+        self.images += len(images)
+        return [{
+            "rec_texts": list(STUB_TEXTS),
+            "rec_scores": [0.9] * len(STUB_TEXTS),
+            "dt_polys": [np.zeros((4, 2), dtype=np.int16) for _ in STUB_TEXTS],
+            "doc_preprocessor_res": {"input_img": image},
+        } for image in images]
+
+
+def _write_image(path, shade):
+    """
+    Write a small PNG; shade makes its content (and cache key) unique.
+    """
+    img = np.full((40, 60, 3), shade, dtype=np.uint8)
+    path.write_bytes(cv2.imencode(".png", img)[1].tobytes())
+    return path
+
+
+def _output_folders(tmp_path):
+    folders = tuple(tmp_path / name for name in ("json_results", "markdown_results", "raw_data"))
+    for folder in folders:
+        folder.mkdir()
+    return folders
+
+
+def _run(monkeypatch, image_files, folders, hpi=False, use_cache=True):
+    """
+    Run the single-process pipeline with a stub engine; returns the engine.
+    """
+    engine = StubEngine()
+    monkeypatch.setattr(ocr_processor, "create_ocr_engine", lambda **kwargs: (engine, hpi))
+    ocr_processor.run_pipeline(image_files, folders, use_cache=use_cache)
+    return engine
+
+
+def test_cache_miss_then_hit(tmp_path, monkeypatch):
+    """
+    The first run OCRs every image and stores cache entries; a second run
+    with the same settings reuses them without OCR.
+    """
+    folders = _output_folders(tmp_path)
+    raw_data_folder = folders[2]
+    images = [_write_image(tmp_path / "a.png", 200), _write_image(tmp_path / "b.png", 100)]
+    
+    engine = _run(monkeypatch, images, folders)
+    assert engine.images == 1 + len(images)  # warm-up + each image
+    entries = sorted(raw_data_folder.glob("*" + ocr_processor.CACHE_SUFFIX))
+    assert len(entries) == len(images)
+    
+    engine = _run(monkeypatch, images, folders)
+    assert engine.images == 1  # warm-up only
+    
+    for image in images:
+        raw = json.loads((raw_data_folder / (image.stem + "_raw.json")).read_text(encoding="utf-8"))
+        assert raw["raw_result"][0]["rec_texts"] == STUB_TEXTS
+        assert (folders[0] / (image.stem + ".json")).exists()
+
+
+def test_cache_entry_holds_only_raw_result(tmp_path, monkeypatch):
+    """
+    Cache entries hold no per-image metadata: a duplicate image file gets
+    its own name and time in its _raw.json, which is not linked to the entry.
+    """
+    folders = _output_folders(tmp_path)
+    raw_data_folder = folders[2]
+    original = _write_image(tmp_path / "original.png", 150)
+    _run(monkeypatch, [original], folders)
+    
+    duplicate = tmp_path / "duplicate.png"
+    duplicate.write_bytes(original.read_bytes())
+    engine = _run(monkeypatch, [duplicate], folders)
+    assert engine.images == 1  # served from the entry of original.png
+    
+    (entry,) = raw_data_folder.glob("*" + ocr_processor.CACHE_SUFFIX)
+    assert list(json.loads(entry.read_text(encoding="utf-8"))) == ["raw_result"]
+    
+    raw_path = raw_data_folder / "duplicate_raw.json"
+    raw = json.loads(raw_path.read_text(encoding="utf-8"))
+    output = json.loads((folders[0] / "duplicate.json").read_text(encoding="utf-8"))
+    assert raw["image_name"] == "duplicate.png"
+    assert raw["processed_at"] == output["processed_at"]
+    assert os.stat(raw_path).st_nlink == 1
+
+
+def test_settings_change_invalidates_entries(tmp_path, monkeypatch):
+    """
+    Results made with another backend or other settings are not reused.
+    """
+    folders = _output_folders(tmp_path)
+    images = [_write_image(tmp_path / "a.png", 200)]
+    _run(monkeypatch, images, folders, hpi=False)
+    
+    engine = _run(monkeypatch, images, folders, hpi=True)
+    assert engine.images == 2  # warm-up + OCR again
+    
+    salts = {
+        ocr_processor.ocr_cache_salt(False, False),
+        ocr_processor.ocr_cache_salt(False, False, hpi=True),
+        ocr_processor.ocr_cache_salt(False, False, batch_size=ocr_processor.WORKER_BATCH_SIZE),
+        ocr_processor.ocr_cache_salt(True, False),
+        ocr_processor.ocr_cache_salt(False, True),
+    }
+    assert len(salts) == 5
+    
+    monkeypatch.setattr(ocr_processor, "paddleocr_version", lambda: "0.0-other")
+    engine = _run(monkeypatch, images, folders, hpi=False)
+    assert engine.images == 2
+
+
+def test_no_cache_always_runs_ocr(tmp_path, monkeypatch):
+    folders = _output_folders(tmp_path)
+    images = [_write_image(tmp_path / "a.png", 200)]
+    _run(monkeypatch, images, folders)
+    
+    engine = _run(monkeypatch, images, folders, use_cache=False)
+    assert engine.images == 2
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    """
+    A truncated or unreadable entry makes load_for_ocr decode and OCR the
+    image again instead of failing.
+    """
+    raw_data_folder = tmp_path / "raw_data"
+    raw_data_folder.mkdir()
+    image = _write_image(tmp_path / "a.png", 200)
+    salt = ocr_processor.ocr_cache_salt(False, False)
+    digest = ocr_processor.image_digest(image.read_bytes(), salt)
+    entry = raw_data_folder / (digest + ocr_processor.CACHE_SUFFIX)
+    
+    for content in (b'{"raw_result": [{"rec_te', b"", b"[]"):
+        entry.write_bytes(content)
+        img, preprocessed, entry_digest, cached = ocr_processor.load_for_ocr(image, False, raw_data_folder, salt)
+        assert img is not None
+        assert cached is None
+        assert entry_digest == digest
+
+
+def test_entry_is_replaced_not_written_through(tmp_path):
+    """
+    save_ocr_results writes the entry under a temporary name and renames it
+    into place: a reader holding the old file keeps seeing it whole, and no
+    temporary file is left behind.
+    """
+    json_folder, markdown_folder, raw_data_folder = _output_folders(tmp_path)
+    digest = "0" * 32
+    entry = raw_data_folder / (digest + ocr_processor.CACHE_SUFFIX)
+    entry.write_text('{"raw_result": "old"}', encoding="utf-8")
+    reader_view = tmp_path / "reader_view.json"
+    os.link(entry, reader_view)
+    
+    result = StubEngine().ocr(np.zeros((40, 60, 3), dtype=np.uint8))
+    ocr_processor.save_ocr_results(tmp_path / "a.png", result, json_folder, markdown_folder, raw_data_folder,
+                                   digest=digest)
+    
+    assert json.loads(reader_view.read_text(encoding="utf-8")) == {"raw_result": "old"}
+    assert ocr_processor.load_cached_result(raw_data_folder, digest)[0]["rec_texts"] == STUB_TEXTS
+    assert not list(raw_data_folder.glob("*.tmp"))
@@ -3,109 +3,247 @@ Test script for universal parser with all images.
 """
 import json
 import os
+import hashlib
+import traceback
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from parsers import parse_medical_report
 
+try:
+    import orjson
+except ImportError:  # fall back to the (slower) standard library json
+    orjson = None
+
+
+# Folders used by the test (relative to the repository root)
+IMAGES_FOLDER = Path("images")
+RAW_DATA_FOLDER = Path("raw_data")
+JSON_OUTPUT_FOLDER = Path("json_results")
+
+# Parsed reports of earlier runs, keyed by the OCR texts and the parser
+# sources (so a parser change never reuses stale parses). Delete the folder
+# to clear it.
+PARSE_CACHE_FOLDER = JSON_OUTPUT_FOLDER / ".cache"
+
+
+def _parsers_digest():
+    """
+    Digest of the parser sources.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.read_bytes())
+    return digest.digest()
+
+
+PARSERS_DIGEST = _parsers_digest()
+
+
+def _parse_cached(rec_texts):
+    """
+    parse_medical_report(rec_texts), reusing the parse of an earlier run
+    from PARSE_CACHE_FOLDER when the texts and parsers are unchanged.
+    A missing, unreadable or corrupt entry is parsed again and rewritten.
+    """
+    digest = hashlib.blake2b(json.dumps(rec_texts).encode(), digest_size=16)
+    digest.update(PARSERS_DIGEST)
+    cache_path = PARSE_CACHE_FOLDER / f"{digest.hexdigest()}.json"
+    try:
+        data = cache_path.read_bytes()
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+    except (OSError, ValueError):  # orjson.JSONDecodeError is a ValueError
+        pass
+    parsed = parse_medical_report(rec_texts)
+    PARSE_CACHE_FOLDER.mkdir(exist_ok=True)
+    if orjson is not None:
+        data = orjson.dumps(parsed)
+    else:
+        data = json.dumps(parsed, ensure_ascii=False).encode('utf-8')
+    # Workers run in parallel: write under a temporary name and rename it
+    # into place, so no reader sees a half-written entry
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, cache_path)
+    return parsed
+
+
+def _process_one(image_path):
+    """
+    Parse the raw OCR data of one image and save its test-result file.
+    Runs in a worker process, so it returns the report to print instead of
+    printing it.
+    """
+    image_path = Path(image_path)
+    lines = []
+    log = lines.append
+    
+    # Find corresponding raw data file (reading it is the existence check)
+    raw_filename = image_path.stem + "_raw.json"
+    raw_path = RAW_DATA_FOLDER / raw_filename
+    
+    try:
+        raw_bytes = raw_path.read_bytes()
+    except FileNotFoundError:
+        log(f"  [WARNING] Raw data file not found: {raw_path}")
+        log(f"  [SKIP] Skipping {image_path.name}\n")
+        return "\n".join(lines)
+    
+    try:
+        # Load raw data
+        raw_data = orjson.loads(raw_bytes) if orjson is not None else json.loads(raw_bytes)
+        
+        # Extract rec_texts (the raw result is normally a list of result dicts)
+        raw_result = raw_data.get('raw_result')
+        first_result = raw_result[0] if raw_result else None
+        try:
+            rec_texts = first_result.get('rec_texts') or []
+        except AttributeError:
+            # Sometimes rec_texts might be directly in the list
+            rec_texts = first_result if isinstance(first_result, list) else []
+        
+        if not rec_texts:
+            log(f"  [WARNING] No rec_texts found in raw data")
+            log(f"  [SKIP] Skipping {image_path.name}\n")
+            return "\n".join(lines)
+        
+        log(f"  [INFO] Found {len(rec_texts)} text items")
+        
+        # Parse using universal parser (cached across runs)
+        parsed = _parse_cached(rec_texts)
+        
+        # Print summary
+        patient_id = parsed.get('patient_info', {}).get('patient_id', 'N/A')
+        haematology_count = len(parsed.get('haematology_report', []))
+        blood_indices_count = len(parsed.get('blood_indices', []))
+        
+        log(f"  [INFO] Extracted: Patient ID={patient_id}, "
+            f"Haematology tests={haematology_count}, "
+            f"Blood indices={blood_indices_count}")
+        
+        # Save result with test-result in filename
+        output = {
+            "image_name": raw_data.get('image_name', image_path.name),
+            "image_path": raw_data.get('image_path', str(image_path)),
+            "processed_at": raw_data.get('processed_at'),
+            **parsed
+        }
+        
+        # Create filename with test-result prefix
+        test_result_filename = f"test-result_{image_path.stem}.json"
+        test_result_path = JSON_OUTPUT_FOLDER / test_result_filename
+        
+        # ocr_processor hard-links this file to the JSON result, so
+        # replace it instead of writing through the link
+        test_result_path.unlink(missing_ok=True)
+        if orjson is not None:
+            test_result_path.write_bytes(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+        else:
+            with open(test_result_path, 'w', encoding='utf-8') as f:
+                json.dump(output, f, indent=2, ensure_ascii=False)
+        
+        log(f"  [OK] Test result saved: {test_result_path}\n")
+    
+    except Exception as e:
+        error_msg = str(e) if str(e) else type(e).__name__
+        log(f"  [ERROR] Error processing {image_path.name}: {error_msg}")
+        log(traceback.format_exc())
+    
+    return "\n".join(lines)
+
+
 def test_universal_parser_all_images():
     """
     Test universal parser with all images present in the images folder.
-    Creates test-result files for each image.
+    Creates test-result files for each image. Images are independent, so
+    they are processed in a pool of worker processes.
     """
-    # Define paths
-    images_folder = Path("images")
-    raw_data_folder = Path("raw_data")
-    json_output_folder = Path("json_results")
-    
     # Create output folder if it doesn't exist
-    json_output_folder.mkdir(exist_ok=True)
+    JSON_OUTPUT_FOLDER.mkdir(exist_ok=True)
     
-    # Get all image files
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp'}
-    image_files = [f for f in images_folder.iterdir() 
-                   if f.suffix.lower() in image_extensions]
+    # Get all image files (scandir entries carry their type, so only the
+    # matching ones need a Path)
+    image_extensions = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp'})
+    with os.scandir(IMAGES_FOLDER) as entries:
+        image_files = [Path(entry.path) for entry in entries
+                       if os.path.splitext(entry.name)[1].lower() in image_extensions and entry.is_file()]
     
     if not image_files:
-        print(f"No images found in '{images_folder}' folder!")
+        print(f"No images found in '{IMAGES_FOLDER}' folder!")
         return
     
     print(f"Found {len(image_files)} image(s) to test...\n")
     
-    # Process each image
-    for idx, image_path in enumerate(image_files, 1):
-        print(f"[{idx}/{len(image_files)}] Processing: {image_path.name}")
-        
-        # Find corresponding raw data file
-        raw_filename = image_path.stem + "_raw.json"
-        raw_path = raw_data_folder / raw_filename
-        
-        if not raw_path.exists():
-            print(f"  [WARNING] Raw data file not found: {raw_path}")
-            print(f"  [SKIP] Skipping {image_path.name}\n")
-            continue
-        
-        try:
-            # Load raw data
-            with open(raw_path, 'r', encoding='utf-8') as f:
-                raw_data = json.load(f)
-            
-            # Extract rec_texts
-            rec_texts = []
-            if raw_data.get('raw_result') and len(raw_data['raw_result']) > 0:
-                first_result = raw_data['raw_result'][0]
-                if isinstance(first_result, dict) and 'rec_texts' in first_result:
-                    rec_texts = first_result.get('rec_texts', [])
-                elif isinstance(first_result, list):
-                    # Sometimes rec_texts might be directly in the list
-                    rec_texts = first_result
-            
-            if not rec_texts:
-                print(f"  [WARNING] No rec_texts found in raw data")
-                print(f"  [SKIP] Skipping {image_path.name}\n")
-                continue
-            
-            print(f"  [INFO] Found {len(rec_texts)} text items")
-            
-            # Parse using universal parser
-            parsed = parse_medical_report(rec_texts)
-            
-            # Print summary
-            patient_id = parsed.get('patient_info', {}).get('patient_id', 'N/A')
-            haematology_count = len(parsed.get('haematology_report', []))
-            blood_indices_count = len(parsed.get('blood_indices', []))
-            
-            print(f"  [INFO] Extracted: Patient ID={patient_id}, "
-                  f"Haematology tests={haematology_count}, "
-                  f"Blood indices={blood_indices_count}")
-            
-            # Save result with test-result in filename
-            output = {
-                "image_name": raw_data.get('image_name', image_path.name),
-                "image_path": raw_data.get('image_path', str(image_path)),
-                "processed_at": raw_data.get('processed_at'),
-                **parsed
-            }
-            
-            # Create filename with test-result prefix
-            test_result_filename = f"test-result_{image_path.stem}.json"
-            test_result_path = json_output_folder / test_result_filename
-            
-            with open(test_result_path, 'w', encoding='utf-8') as f:
-                json.dump(output, f, indent=2, ensure_ascii=False)
-            
-            print(f"  [OK] Test result saved: {test_result_path}\n")
-        
-        except Exception as e:
-            import traceback
-            error_msg = str(e) if str(e) else type(e).__name__
-            print(f"  [ERROR] Error processing {image_path.name}: {error_msg}")
-            traceback.print_exc()
-            print()
+    # Process the images in parallel, printing the reports in order
+    workers = min(len(image_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reports = executor.map(_process_one, map(str, image_files))
+        for idx, (image_path, report) in enumerate(zip(image_files, reports), 1):
+            print(f"[{idx}/{len(image_files)}] Processing: {image_path.name}")
+            print(report)
     
     print("="*60)
     print("✅ Testing complete! All test-result files saved in json_results folder.")
     print("="*60)
 
 
+# OCR texts of a short report, for the parse cache tests
+SAMPLE_TEXTS = ["PARTH PATHOLOGY LABORATORY", "Patient ID", ": 202504255",
+                "HAEMATOLOGY REPORT", "HEMOGLOBIN", ": 12.0", "g/dl", "13.5-17.5"]
+
+
+def _count_parses(monkeypatch, tmp_path):
+    """
+    Point _parse_cached at a cache folder under tmp_path and count the calls
+    it makes to parse_medical_report.
+    """
+    calls = []
+    parse = parse_medical_report
+    
+    def counting_parse(rec_texts):
+        calls.append(rec_texts)
+        return parse(rec_texts)
+    
+    monkeypatch.setitem(globals(), "PARSE_CACHE_FOLDER", tmp_path / "cache")
+    monkeypatch.setitem(globals(), "parse_medical_report", counting_parse)
+    return calls
+
+
+def test_parse_cache_hit_and_miss(tmp_path, monkeypatch):
+    """
+    The first parse is stored (without leaving a temporary file); the same
+    texts are then served from the cache, until the parser sources change.
+    """
+    calls = _count_parses(monkeypatch, tmp_path)
+    expected = parse_medical_report(SAMPLE_TEXTS)
+    calls.clear()
+    
+    assert _parse_cached(SAMPLE_TEXTS) == expected
+    assert len(calls) == 1
+    entries = list((tmp_path / "cache").iterdir())
+    assert len(entries) == 1 and entries[0].suffix == ".json"
+    
+    assert _parse_cached(SAMPLE_TEXTS) == expected
+    assert len(calls) == 1
+    
+    monkeypatch.setitem(globals(), "PARSERS_DIGEST", b"other parser sources")
+    assert _parse_cached(SAMPLE_TEXTS) == expected
+    assert len(calls) == 2
+
+
+def test_parse_cache_corrupt_entry(tmp_path, monkeypatch):
+    """
+    A truncated entry is parsed again and rewritten instead of failing.
+    """
+    calls = _count_parses(monkeypatch, tmp_path)
+    expected = _parse_cached(SAMPLE_TEXTS)
+    (entry,) = (tmp_path / "cache").iterdir()
+    entry.write_bytes(entry.read_bytes()[:20])
+    
+    assert _parse_cached(SAMPLE_TEXTS) == expected
+    assert len(calls) == 2
+    assert json.loads(entry.read_bytes()) == expected
+    assert [path.name for path in (tmp_path / "cache").iterdir()] == [entry.name]
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Universal Parser Test - All Images")
@@ -4,7 +4,9 @@ Uses predefined common fields and intelligent pattern matching.
 """
 
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, TextIO, Tuple
+
+from .common import empty_report, keyword_re, has_digit
 
 
 # Predefined common fields for blood reports
@@ -77,6 +79,59 @@ COMMON_FOOTER_FIELDS = {
 }
 
 
+# Precompiled keyword patterns, built once at import
+_TEST_NAME_RE = keyword_re([keyword for keywords in COMMON_TEST_NAMES.values() for keyword in keywords])
+_BLOOD_INDEX_RE = keyword_re([keyword for name in ['mcv', 'mch', 'mchc', 'hct', 'rdw', 'mpv', 'pct', 'pdw']
+                              for keyword in COMMON_TEST_NAMES[name]])
+_UNIT_RE = keyword_re(['g/dl', 'g/l', '%', 'fl', 'pg', '/ul', '/cumm', '/l', 'million/ul',
+                       'x103', 'x10^3', 'cells/ul', 'lakhs', 'cmm', 'mill/cumm'])
+_RANGE_RE = re.compile(r'\d+[\s-]+\d+')
+
+# Table column headers that are never test names
+_COLUMN_HEADERS = frozenset(['TEST DESCRIPTION', 'RESULT', 'REF. RANGE', 'UNIT',
+                             'Test Name', 'Observed Value', 'Reference Range',
+                             'Investigation', 'Units', 'Biological Reference Interval'])
+_UPPER_COLUMN_HEADERS = frozenset(['TEST DESCRIPTION', 'RESULT', 'REF. RANGE', 'UNIT',
+                                   'TEST NAME', 'OBSERVED VALUE', 'REFERENCE RANGE',
+                                   'INVESTIGATION', 'UNITS', 'BIOLOGICAL REFERENCE INTERVAL'])
+
+# Items that are only a separator left over by OCR, never a value
+_SEPARATOR_ITEMS = frozenset([':', '.', '"', "'"])
+
+# Substrings of the item after a lab name that mean it is not part of the name
+_LAB_NAME_STOP_RE = keyword_re([':', 'date', 'no', 'id'])
+
+# Section headings, matched against upper-cased text
+_SECTION_HEADER_RE = keyword_re(['HAEMATOLOGY', 'BLOOD INDICES', 'DIFFERENTIAL COUNT',
+                                 'PLATELET COUNT', 'RBC INDICES', 'PLATELETS INDICES',
+                                 'ABSOLUTE LEUCOCYTE COUNT', 'COMPLETE BLOOD COUNT'])
+_HAEMATOLOGY_RE = keyword_re(['HAEMATOLOGY', 'HEMATOLOGY', 'CBC', 'COMPLETE BLOOD COUNT'])
+_BLOOD_INDICES_RE = keyword_re(['BLOOD INDICES', 'RBC INDICES', 'PLATELETS INDICES'])
+_DIFFERENTIAL_RE = keyword_re(['DIFFERENTIAL COUNT', 'DIFFERENTIAL LEUCOCYTE COUNT'])
+_ABSOLUTE_RE = keyword_re(['ABSOLUTE LEUCOCYTE COUNT', 'ABSOLUTE COUNT'])
+_MORPHOLOGY_RE = keyword_re(['RBC MORPHOLOGY', 'PLATELETS ON SMEAR', 'MORPHOLOGY'])
+
+# One pattern per group of checks in parse_universal_format: a single scan
+# tells whether an item can match any check of the group, so items that
+# match none skip the per-keyword checks entirely
+_ANY_SECTION_RE = keyword_re(['HAEMATOLOGY', 'HEMATOLOGY', 'CBC', 'COMPLETE BLOOD COUNT',
+                              'BLOOD INDICES', 'RBC INDICES', 'PLATELETS INDICES',
+                              'DIFFERENTIAL COUNT', 'DIFFERENTIAL LEUCOCYTE COUNT',
+                              'ABSOLUTE LEUCOCYTE COUNT', 'ABSOLUTE COUNT',
+                              'RBC MORPHOLOGY', 'PLATELETS ON SMEAR', 'MORPHOLOGY'])
+_ANY_PATIENT_FIELD_RE = keyword_re([keyword for keywords in COMMON_PATIENT_FIELDS.values() for keyword in keywords])
+_ANY_LAB_FIELD_RE = keyword_re([keyword for keywords in COMMON_LAB_FIELDS.values() for keyword in keywords])
+_ANY_MORPHOLOGY_FIELD_RE = keyword_re([keyword for keywords in COMMON_MORPHOLOGY_FIELDS.values() for keyword in keywords])
+_ANY_FOOTER_FIELD_RE = keyword_re([keyword for keywords in COMMON_FOOTER_FIELDS.values() for keyword in keywords])
+
+# (field name, pattern matching any of its keywords) per field, in check order;
+# used on normalized text instead of matches_field() per field
+_PATIENT_FIELD_RES = tuple((field_name, keyword_re(keywords)) for field_name, keywords in COMMON_PATIENT_FIELDS.items())
+_LAB_FIELD_RES = tuple((field_name, keyword_re(keywords)) for field_name, keywords in COMMON_LAB_FIELDS.items())
+_MORPHOLOGY_FIELD_RES = tuple((field_name, keyword_re(keywords)) for field_name, keywords in COMMON_MORPHOLOGY_FIELDS.items())
+_FOOTER_FIELD_RES = tuple((field_name, keyword_re(keywords)) for field_name, keywords in COMMON_FOOTER_FIELDS.items())
+
+
 def normalize_text(text: str) -> str:
     """Normalize text for comparison."""
     if not text:
@@ -97,31 +152,26 @@ def extract_value_after_colon(texts: List[str], start_idx: int, max_lookahead: i
     """Extract value after a colon or in next few items."""
     # Check current item for colon
     if start_idx < len(texts):
-        current = texts[start_idx]
-        if ':' in current:
-            parts = current.split(':', 1)
-            if len(parts) > 1 and parts[1].strip():
-                return parts[1].strip()
+        _, sep, tail = texts[start_idx].partition(':')
+        if sep:
+            tail = tail.strip()
+            if tail:
+                return tail
     
     # Look ahead
     for i in range(1, min(max_lookahead + 1, len(texts) - start_idx)):
         if start_idx + i < len(texts):
             value = texts[start_idx + i].strip()
             # Skip empty, colons only, or common separators
-            if value and value not in [':', '.', '"', "'"] and not value.startswith(':'):
+            if value and value not in _SEPARATOR_ITEMS and not value.startswith(':'):
                 return value
     return None
 
 
 def is_test_name(text: str) -> bool:
     """Check if text looks like a test name."""
-    normalized = normalize_text(text)
     # Check against common test names
-    for test_keywords in COMMON_TEST_NAMES.values():
-        for keyword in test_keywords:
-            if keyword in normalized:
-                return True
-    return False
+    return _TEST_NAME_RE.search(normalize_text(text)) is not None
 
 
 def is_number(text: str) -> bool:
@@ -141,45 +191,45 @@ def is_reference_range(text: str) -> bool:
     """Check if text looks like a reference range."""
     if not text:
         return False
-    # Pattern: number-number or number - number
-    pattern = r'\d+[\s-]+\d+'
-    if re.search(pattern, text):
-        return True
-    # Pattern: number-number-number (like 13-17)
-    if '-' in text and any(c.isdigit() for c in text):
-        return True
-    return False
+    # Pattern: number-number-number (like 13-17); any dash with a digit
+    # covers every number-number match as well
+    if '-' in text:
+        return has_digit(text)
+    # Pattern: number number
+    return _RANGE_RE.search(text) is not None
 
 
 def is_unit(text: str) -> bool:
     """Check if text looks like a unit."""
     if not text:
         return False
-    normalized = normalize_text(text)
-    units = ['g/dl', 'g/l', '%', 'fl', 'pg', '/ul', '/cumm', '/l', 'million/ul', 
-             'x103', 'x10^3', 'cells/ul', 'lakhs', 'cmm', 'mill/cumm']
-    return any(unit in normalized for unit in units)
+    return _UNIT_RE.search(normalize_text(text)) is not None
+
 
+def _classify_value(text: str) -> Tuple[bool, bool, bool]:
+    """Return (is_number, is_unit, is_reference_range) for a lookahead item."""
+    return is_number(text), is_unit(text), is_reference_range(text)
 
-def parse_test_result(texts: List[str], start_idx: int) -> Optional[Dict[str, Any]]:
+
+def parse_test_result(texts: List[str], start_idx: int,
+                      classify_cache: Optional[Dict[str, Tuple[bool, bool, bool]]] = None) -> Optional[Dict[str, Any]]:
     """
     Parse a test result starting from start_idx.
     Returns dict with test_name, observed_value, unit, reference_range or None.
+    classify_cache memoizes _classify_value() per item text; OCR output
+    repeats units and values, so parse_universal_format shares one per parse.
     """
+    if classify_cache is None:
+        classify_cache = {}
     if start_idx >= len(texts):
         return None
     
     test_name = texts[start_idx].strip()
-    if not test_name or test_name in ['TEST DESCRIPTION', 'RESULT', 'REF. RANGE', 'UNIT', 
-                                       'Test Name', 'Observed Value', 'Reference Range',
-                                       'Investigation', 'Units', 'Biological Reference Interval']:
+    if not test_name or test_name in _COLUMN_HEADERS:
         return None
     
     # Skip if it's a section header
-    section_headers = ['HAEMATOLOGY', 'BLOOD INDICES', 'DIFFERENTIAL COUNT', 
-                       'PLATELET COUNT', 'RBC INDICES', 'PLATELETS INDICES',
-                       'ABSOLUTE LEUCOCYTE COUNT', 'COMPLETE BLOOD COUNT']
-    if any(header in test_name.upper() for header in section_headers):
+    if _SECTION_HEADER_RE.search(test_name.upper()):
         return None
     
     result = {
@@ -196,53 +246,56 @@ def parse_test_result(texts: List[str], start_idx: int) -> Optional[Dict[str, An
     found_range = False
     
     # Check if current item has colon with value
-    if ':' in test_name:
-        parts = test_name.split(':', 1)
-        if len(parts) > 1:
-            test_name = parts[0].strip()
-            potential_value = parts[1].strip()
-            if potential_value and (is_number(potential_value) or potential_value):
-                result['test_name'] = test_name
-                result['observed_value'] = potential_value
-                found_value = True
+    name_part, sep, value_part = test_name.partition(':')
+    if sep:
+        test_name = name_part.strip()
+        potential_value = value_part.strip()
+        if potential_value and (is_number(potential_value) or potential_value):
+            result['test_name'] = test_name
+            result['observed_value'] = potential_value
+            found_value = True
     
     result['test_name'] = test_name
     
     # Look ahead up to 5 items
-    while i < min(start_idx + 6, len(texts)) and (not found_value or not found_unit or not found_range):
+    end = min(start_idx + 6, len(texts))
+    while i < end and (not found_value or not found_unit or not found_range):
         current = texts[i].strip()
         
-        if not current or current in [':', '.', '"', "'"]:
+        if not current or current in _SEPARATOR_ITEMS:
             i += 1
             continue
         
+        flags = classify_cache.get(current)
+        if flags is None:
+            flags = classify_cache[current] = _classify_value(current)
+        looks_number, looks_unit, looks_range = flags
+        
         # Check for value (number)
-        if not found_value and is_number(current) and not is_reference_range(current):
+        if not found_value and looks_number and not looks_range:
             result['observed_value'] = current
             found_value = True
             i += 1
             continue
         
         # Check for unit
-        if not found_unit and is_unit(current):
+        if not found_unit and looks_unit:
             result['unit'] = current
             found_unit = True
             i += 1
             continue
         
         # Check for reference range
-        if not found_range and is_reference_range(current):
+        if not found_range and looks_range:
             result['reference_range'] = current
             found_range = True
             i += 1
             continue
         
         # If we found value but next item might be value with colon
-        if found_value and ':' in current:
-            parts = current.split(':', 1)
-            if len(parts) > 1 and parts[1].strip():
-                # This might be another test, stop here
-                break
+        if found_value and current.partition(':')[2].strip():
+            # This might be another test, stop here
+            break
         
         i += 1
     
@@ -258,15 +311,8 @@ def parse_universal_format(texts: List[str]) -> Dict[str, Any]:
     Universal parser for blood reports.
     Extracts common fields and handles any format intelligently.
     """
-    parsed_data = {
-        "patient_info": {},
-        "laboratory_info": {},
-        "haematology_report": [],
-        "blood_indices": [],
-        "morphology": {},
-        "footer_info": {},
-        "other_fields": {}  # For unknown fields
-    }
+    parsed_data = empty_report()
+    parsed_data["other_fields"] = {}  # For unknown fields
     
     if not texts:
         return parsed_data
@@ -274,6 +320,7 @@ def parse_universal_format(texts: List[str]) -> Dict[str, Any]:
     # Convert to list of strings
     texts = [str(t).strip() if t else "" for t in texts]
     
+    classify_cache: Dict[str, Tuple[bool, bool, bool]] = {}
     i = 0
     in_haematology_section = False
     in_blood_indices_section = False
@@ -283,100 +330,94 @@ def parse_universal_format(texts: List[str]) -> Dict[str, Any]:
     while i < len(texts):
         text = texts[i]
         
-        if not text or text in [':', '.', '"', "'"]:
+        if not text or text in _SEPARATOR_ITEMS:
             i += 1
             continue
         
         text_upper = text.upper()
-        text_lower = text.lower()
+        normalized = normalize_text(text)
         
         # Detect sections
-        if any(x in text_upper for x in ['HAEMATOLOGY', 'HEMATOLOGY', 'CBC', 'COMPLETE BLOOD COUNT']):
-            in_haematology_section = True
-            in_blood_indices_section = False
-            i += 1
-            # Skip headers
-            while i < len(texts) and texts[i].upper() in ['TEST DESCRIPTION', 'RESULT', 'REF. RANGE', 'UNIT',
-                                                          'TEST NAME', 'OBSERVED VALUE', 'REFERENCE RANGE',
-                                                          'INVESTIGATION', 'UNITS', 'BIOLOGICAL REFERENCE INTERVAL']:
+        if _ANY_SECTION_RE.search(text_upper):
+            if _HAEMATOLOGY_RE.search(text_upper):
+                in_haematology_section = True
+                in_blood_indices_section = False
                 i += 1
-            continue
-        
-        if any(x in text_upper for x in ['BLOOD INDICES', 'RBC INDICES', 'PLATELETS INDICES']):
-            in_blood_indices_section = True
-            in_haematology_section = False
-            i += 1
-            continue
-        
-        if any(x in text_upper for x in ['DIFFERENTIAL COUNT', 'DIFFERENTIAL LEUCOCYTE COUNT']):
-            current_category = "Differential Count"
-            i += 1
-            continue
-        
-        if any(x in text_upper for x in ['ABSOLUTE LEUCOCYTE COUNT', 'ABSOLUTE COUNT']):
-            current_category = "Absolute Count"
-            i += 1
-            continue
-        
-        if any(x in text_upper for x in ['RBC MORPHOLOGY', 'PLATELETS ON SMEAR', 'MORPHOLOGY']):
-            in_morphology_section = True
-            i += 1
-            continue
+                # Skip headers
+                while i < len(texts) and texts[i].upper() in _UPPER_COLUMN_HEADERS:
+                    i += 1
+                continue
+            
+            if _BLOOD_INDICES_RE.search(text_upper):
+                in_blood_indices_section = True
+                in_haematology_section = False
+                i += 1
+                continue
+            
+            if _DIFFERENTIAL_RE.search(text_upper):
+                current_category = "Differential Count"
+                i += 1
+                continue
+            
+            if _ABSOLUTE_RE.search(text_upper):
+                current_category = "Absolute Count"
+                i += 1
+                continue
+            
+            if _MORPHOLOGY_RE.search(text_upper):
+                in_morphology_section = True
+                i += 1
+                continue
         
         # Parse patient info fields
-        for field_name, keywords in COMMON_PATIENT_FIELDS.items():
-            if matches_field(text, keywords):
-                value = extract_value_after_colon(texts, i)
-                if value:
-                    # Handle age/gender split
-                    if field_name == 'age_gender':
-                        if '/' in value:
-                            parts = value.split('/', 1)
-                            if len(parts) == 2:
-                                parsed_data["patient_info"]["age"] = parts[0].strip()
-                                parsed_data["patient_info"]["gender"] = parts[1].strip()
-                        else:
-                            parsed_data["patient_info"][field_name] = value
-                    else:
-                        parsed_data["patient_info"][field_name] = value
-                    i += 2
-                    break
-        
-        # Parse laboratory info
-        for field_name, keywords in COMMON_LAB_FIELDS.items():
-            if matches_field(text, keywords):
-                if field_name == 'name':
-                    # Lab name might be in current text or next
-                    lab_name = text
-                    if i + 1 < len(texts) and not matches_field(texts[i + 1], COMMON_PATIENT_FIELDS):
-                        next_text = texts[i + 1]
-                        if not any(x in next_text.lower() for x in [':', 'date', 'no', 'id']):
-                            lab_name = f"{text} {next_text}".strip()
-                            i += 1
-                    parsed_data["laboratory_info"]["name"] = lab_name
-                else:
+        if _ANY_PATIENT_FIELD_RE.search(normalized):
+            for field_name, field_re in _PATIENT_FIELD_RES:
+                if field_re.search(normalized):
                     value = extract_value_after_colon(texts, i)
                     if value:
-                        parsed_data["laboratory_info"][field_name] = value
+                        # Handle age/gender split
+                        if field_name == 'age_gender':
+                            if '/' in value:
+                                parts = value.split('/', 1)
+                                if len(parts) == 2:
+                                    parsed_data["patient_info"]["age"] = parts[0].strip()
+                                    parsed_data["patient_info"]["gender"] = parts[1].strip()
+                            else:
+                                parsed_data["patient_info"][field_name] = value
+                        else:
+                            parsed_data["patient_info"][field_name] = value
                         i += 2
                         break
-                i += 1
-                break
+        
+        # Parse laboratory info
+        if _ANY_LAB_FIELD_RE.search(normalized):
+            for field_name, field_re in _LAB_FIELD_RES:
+                if field_re.search(normalized):
+                    if field_name == 'name':
+                        # Lab name might be in current text or next
+                        lab_name = text
+                        if i + 1 < len(texts) and not matches_field(texts[i + 1], COMMON_PATIENT_FIELDS):
+                            next_text = texts[i + 1]
+                            if not _LAB_NAME_STOP_RE.search(next_text.lower()):
+                                lab_name = f"{text} {next_text}".strip()
+                                i += 1
+                        parsed_data["laboratory_info"]["name"] = lab_name
+                    else:
+                        value = extract_value_after_colon(texts, i)
+                        if value:
+                            parsed_data["laboratory_info"][field_name] = value
+                            i += 2
+                            break
+                    i += 1
+                    break
         
         # Parse test results
-        test_result = parse_test_result(texts, i)
+        test_result = parse_test_result(texts, i, classify_cache)
         if test_result:
             test_name_lower = normalize_text(test_result['test_name'])
             
             # Determine if it's blood indices or haematology
-            is_blood_index = any(
-                keyword in test_name_lower 
-                for keywords in [COMMON_TEST_NAMES['mcv'], COMMON_TEST_NAMES['mch'], 
-                                COMMON_TEST_NAMES['mchc'], COMMON_TEST_NAMES['hct'],
-                                COMMON_TEST_NAMES['rdw'], COMMON_TEST_NAMES['mpv'],
-                                COMMON_TEST_NAMES['pct'], COMMON_TEST_NAMES['pdw']]
-                for keyword in keywords
-            )
+            is_blood_index = _BLOOD_INDEX_RE.search(test_name_lower) is not None
             
             # Add category if applicable
             if current_category:
@@ -399,9 +440,9 @@ def parse_universal_format(texts: List[str]) -> Dict[str, Any]:
             continue
         
         # Parse morphology
-        if in_morphology_section:
-            for field_name, keywords in COMMON_MORPHOLOGY_FIELDS.items():
-                if matches_field(text, keywords):
+        if in_morphology_section and _ANY_MORPHOLOGY_FIELD_RE.search(normalized):
+            for field_name, field_re in _MORPHOLOGY_FIELD_RES:
+                if field_re.search(normalized):
                     value = extract_value_after_colon(texts, i)
                     if value:
                         # Check if next item is also part of morphology
@@ -415,23 +456,25 @@ def parse_universal_format(texts: List[str]) -> Dict[str, Any]:
                         break
         
         # Parse footer info
-        for field_name, keywords in COMMON_FOOTER_FIELDS.items():
-            if matches_field(text, keywords):
-                value = extract_value_after_colon(texts, i)
-                if value:
-                    parsed_data["footer_info"][field_name] = value
-                    i += 2
-                else:
-                    # Sometimes the field name itself is the value (e.g., "Dr. Name")
-                    parsed_data["footer_info"][field_name] = text
-                    i += 1
-                break
+        if _ANY_FOOTER_FIELD_RE.search(normalized):
+            for field_name, field_re in _FOOTER_FIELD_RES:
+                if field_re.search(normalized):
+                    value = extract_value_after_colon(texts, i)
+                    if value:
+                        parsed_data["footer_info"][field_name] = value
+                        i += 2
+                    else:
+                        # Sometimes the field name itself is the value (e.g., "Dr. Name")
+                        parsed_data["footer_info"][field_name] = text
+                        i += 1
+                    break
         
         # Store unknown fields in other_fields
         if i < len(texts):
             # Check if this looks like a key-value pair we haven't captured
-            if ':' in text and i + 1 < len(texts):
-                key = text.split(':')[0].strip()
+            key, sep, _ = text.partition(':')
+            if sep and i + 1 < len(texts):
+                key = key.strip()
                 value = extract_value_after_colon(texts, i)
                 if value and key and len(key) > 2:  # Only store meaningful keys
                     if key not in parsed_data["other_fields"]:
@@ -447,85 +490,110 @@ def parse_universal_format(texts: List[str]) -> Dict[str, Any]:
     return parsed_data
 
 
-def generate_markdown(data: Dict[str, Any]) -> str:
+# Markdown table layout shared by the test result sections
+_TABLE_HEADER = (
+    "| Test Name | Observed Value | Unit | Reference Range |\n"
+    "|-----------|----------------|------|-----------------|\n"
+)
+_TABLE_ROW = "| {test_name} | {observed_value} | {unit} | {reference_range} |\n"
+
+
+def _escape_cell(value: Any) -> str:
     """
-    Generate Markdown formatted output from structured data.
+    Format a value for a Markdown table cell (pipes are escaped).
+    str.replace is used rather than str.translate: for short cells it is
+    many times faster, and it returns the string itself when there is no
+    pipe to escape.
+    """
+    return str(value).replace('|', '\\|')
+
+
+class _TableCells:
+    """
+    Mapping view of a test result for _TABLE_ROW.format_map(): missing
+    fields render as empty cells and every value is escaped.
     """
-    md = f"# Medical Report: {data.get('image_name', 'Unknown')}\n\n"
+    __slots__ = ('test',)
+    
+    def __init__(self, test: Dict[str, Any]):
+        self.test = test
+    
+    def __getitem__(self, key: str) -> str:
+        return _escape_cell(self.test.get(key, ''))
+
+
+def _field_lines(fields: Dict[str, Any], join_lists: bool = False) -> str:
+    """
+    Render the non-empty fields of a section as Markdown list items, joined
+    in one pass. With join_lists, list values are written comma-separated.
+    """
+    return "".join(
+        f"- **{key.replace('_', ' ').title()}:** "
+        f"{', '.join(str(v) for v in value) if join_lists and isinstance(value, list) else value}\n"
+        for key, value in fields.items()
+        if value  # Only include non-empty values
+    )
+
+
+def _table_section(title: str, tests: List[Dict[str, Any]]) -> str:
+    """
+    Render a test result section: heading, table header and one row per test.
+    """
+    return "".join([f"## {title}\n\n", _TABLE_HEADER,
+                    *map(_TABLE_ROW.format_map, map(_TableCells, tests)),
+                    "\n"])
+
+
+def _iter_markdown(data: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield the Markdown formatted output of structured data, one section at a time.
+    """
+    yield f"# Medical Report: {data.get('image_name', 'Unknown')}\n\n"
     
     if data.get('image_path'):
-        md += f"**Image Path:** `{data['image_path']}`\n\n"
+        yield f"**Image Path:** `{data['image_path']}`\n\n"
     
     if data.get('processed_at'):
-        md += f"**Processed At:** {data['processed_at']}\n\n"
+        yield f"**Processed At:** {data['processed_at']}\n\n"
     
     # Patient Info
     if data.get('patient_info'):
-        md += "## Patient Information\n\n"
-        for key, value in data['patient_info'].items():
-            if value:  # Only include non-empty values
-                md += f"- **{key.replace('_', ' ').title()}:** {value}\n"
-        md += "\n"
+        yield "".join(["## Patient Information\n\n", _field_lines(data['patient_info']), "\n"])
     
     # Laboratory Info
     if data.get('laboratory_info'):
-        md += "## Laboratory Information\n\n"
-        for key, value in data['laboratory_info'].items():
-            if value:  # Only include non-empty values
-                md += f"- **{key.replace('_', ' ').title()}:** {value}\n"
-        md += "\n"
+        yield "".join(["## Laboratory Information\n\n", _field_lines(data['laboratory_info']), "\n"])
     
     # Haematology Report
     if data.get('haematology_report'):
-        md += "## Haematology Report\n\n"
-        md += "| Test Name | Observed Value | Unit | Reference Range |\n"
-        md += "|-----------|----------------|------|-----------------|\n"
-        for test in data['haematology_report']:
-            test_name = str(test.get('test_name', '')).replace('|', '\\|')
-            value = str(test.get('observed_value', '')).replace('|', '\\|')
-            unit = str(test.get('unit', '')).replace('|', '\\|')
-            ref_range = str(test.get('reference_range', '')).replace('|', '\\|')
-            md += f"| {test_name} | {value} | {unit} | {ref_range} |\n"
-        md += "\n"
+        yield _table_section("Haematology Report", data['haematology_report'])
     
     # Blood Indices
     if data.get('blood_indices'):
-        md += "## Blood Indices\n\n"
-        md += "| Test Name | Observed Value | Unit | Reference Range |\n"
-        md += "|-----------|----------------|------|-----------------|\n"
-        for test in data['blood_indices']:
-            test_name = str(test.get('test_name', '')).replace('|', '\\|')
-            value = str(test.get('observed_value', '')).replace('|', '\\|')
-            unit = str(test.get('unit', '')).replace('|', '\\|')
-            ref_range = str(test.get('reference_range', '')).replace('|', '\\|')
-            md += f"| {test_name} | {value} | {unit} | {ref_range} |\n"
-        md += "\n"
+        yield _table_section("Blood Indices", data['blood_indices'])
     
     # Morphology
     if data.get('morphology'):
-        md += "## Morphology\n\n"
-        for key, value in data['morphology'].items():
-            if value:  # Only include non-empty values
-                md += f"- **{key.replace('_', ' ').title()}:** {value}\n"
-        md += "\n"
+        yield "".join(["## Morphology\n\n", _field_lines(data['morphology']), "\n"])
     
     # Footer Info
     if data.get('footer_info'):
-        md += "## Footer Information\n\n"
-        for key, value in data['footer_info'].items():
-            if value:  # Only include non-empty values
-                md += f"- **{key.replace('_', ' ').title()}:** {value}\n"
-        md += "\n"
+        yield "".join(["## Footer Information\n\n", _field_lines(data['footer_info']), "\n"])
     
     # Other Fields
     if data.get('other_fields'):
-        md += "## Other Fields\n\n"
-        for key, value in data['other_fields'].items():
-            if value:  # Only include non-empty values
-                if isinstance(value, list):
-                    md += f"- **{key.replace('_', ' ').title()}:** {', '.join(str(v) for v in value)}\n"
-                else:
-                    md += f"- **{key.replace('_', ' ').title()}:** {value}\n"
-        md += "\n"
-    
-    return md
+        yield "".join(["## Other Fields\n\n", _field_lines(data['other_fields'], join_lists=True), "\n"])
+
+
+def write_markdown(data: Dict[str, Any], fh: TextIO) -> None:
+    """
+    Write Markdown formatted output from structured data to an open text file.
+    """
+    fh.writelines(_iter_markdown(data))
+
+
+def generate_markdown(data: Dict[str, Any]) -> str:
+    """
+    Generate Markdown formatted output from structured data.
+    """
+    return "".join(_iter_markdown(data))